@@ -32,6 +32,7 @@ scrape_status_metrics = TimestampedCollector(
 class CCloudOrg(Observer):
     in_org_details: InitVar[List | None] = None
     in_days_in_memory: InitVar[int] = field(default=7)
+    in_exact_decimal: InitVar[bool] = field(default=False)
     org_id: str
 
     objects_handler: CCloudObjectsHandler = field(init=False)
@@ -44,7 +45,7 @@ class CCloudOrg(Observer):
     exposed_end_date: datetime.datetime = field(init=False)
     reset_counter: int = field(default=0, init=False)
 
-    def __post_init__(self, in_org_details, in_days_in_memory) -> None:
+    def __post_init__(self, in_org_details, in_days_in_memory, in_exact_decimal) -> None:
         Observer.__init__(self)
         LOGGER.debug(f"Sanitizing Org ID {in_org_details['id']}")
         self.org_id = sanitize_id(in_org_details["id"])
@@ -129,6 +130,7 @@ class CCloudOrg(Observer):
             objects_dataset=self.objects_handler,
             metrics_dataset=self.metrics_handler,
             start_date=next_fetch_date,
+            exact_decimal=in_exact_decimal,
         )
 
         LOGGER.debug(f"Attaching CCloudOrg to notifier {scrape_status_metrics._name} for Org ID: {self.org_id}")
@@ -215,16 +217,18 @@ class CCloudOrg(Observer):
 class CCloudOrgList:
     in_orgs: InitVar[List | None] = None
     in_days_in_memory: InitVar[int] = field(default=7)
+    in_exact_decimal: InitVar[bool] = field(default=False)
 
     orgs: Dict[str, CCloudOrg] = field(default_factory=dict, init=False)
 
-    def __post_init__(self, in_orgs, in_days_in_memory) -> None:
+    def __post_init__(self, in_orgs, in_days_in_memory, in_exact_decimal) -> None:
         LOGGER.info("Initializing CCloudOrgList")
         req_count = 0
         for org_item in in_orgs:
             temp = CCloudOrg(
                 in_org_details=org_item,
                 in_days_in_memory=in_days_in_memory,
+                in_exact_decimal=in_exact_decimal,
                 org_id=org_item["id"] if org_item["id"] else req_count,
             )
             self.__add_org_to_cache(ccloud_org=temp)
@@ -1,8 +1,10 @@
 import datetime
 import decimal
 import logging
-from dataclasses import dataclass, field
-from typing import Dict, List
+from collections import defaultdict
+from dataclasses import dataclass, field, fields, replace
+from itertools import chain, repeat
+from typing import Callable, Collection, Dict, FrozenSet, Iterable, List, Set, Tuple
 
 import pandas as pd
 
@@ -20,23 +22,28 @@ from prometheus_processing.notifier import NotifierAbstract, Observer
 
 LOGGER = logging.getLogger(__name__)
 
+# Shared default for the identity lookups, so a miss does not allocate a new empty set for every billing row
+EMPTY_FROZENSET: FrozenSet[str] = frozenset()
 
+
+@dataclass(frozen=True, slots=True)
 class ChargebackColumnNames:
-    TS = "Timestamp"
-    PRINCIPAL = "Principal"
-    ENV_ID = "EnvironmentID"
-    KAFKA_CLUSTER = "KafkaID"
-    PRODUCT_TYPE = "ProductType"
-    USAGE_COST = "UsageCost"
-    SHARED_COST = "SharedCost"
+    TS: str = "Timestamp"
+    PRINCIPAL: str = "Principal"
+    ENV_ID: str = "EnvironmentID"
+    KAFKA_CLUSTER: str = "KafkaID"
+    PRODUCT_TYPE: str = "ProductType"
+    USAGE_COST: str = "UsageCost"
+    SHARED_COST: str = "SharedCost"
 
     @logged_method
-    def override_column_names(self, key, value):
-        object.__setattr__(self, key, value)
+    def override_column_names(self, key, value) -> "ChargebackColumnNames":
+        """The column names are frozen, so an override returns a new object with the updated column name."""
+        return replace(self, **{key: value})
 
     @logged_method
     def all_column_values(self) -> List:
-        return [y for x, y in vars(self).items()]
+        return [getattr(self, x.name) for x in fields(self)]
 
 
 CHARGEBACK_COLUMNS = ChargebackColumnNames()
@@ -54,6 +61,38 @@ chargeback_prom_metrics = TimestampedCollector(
 )
 
 
+def _add_cost(
+    usage_dataset: Dict[Tuple, float],
+    shared_dataset: Dict[Tuple, float],
+    ts_buckets: Dict[datetime.datetime, Set[Tuple]],
+    row_key: Tuple,
+    usage_cost: float,
+    shared_cost: float,
+):
+    """Accumulate the Usage & Shared cost for a chargeback key into the chargeback storage.
+    As the column names & values were needed to be dynamic, we did not use a dataframe here for ease of use.
+    Usage and Shared costs are held in 2 separate dicts with the same keys, so an update is a plain accumulation.
+    This is kept as a plain function over the storage dicts, so the bulk merge can call it without any method lookup.
+
+    Args:
+        usage_dataset (Dict[Tuple, float]): Usage costs keyed by (principal, time_slice, product_type_name, env_id)
+        shared_dataset (Dict[Tuple, float]): Shared costs keyed by (principal, time_slice, product_type_name, env_id)
+        ts_buckets (Dict[datetime.datetime, Set[Tuple]]): The chargeback keys tracked per time_slice for the cleanup
+        row_key (Tuple): The chargeback key -- (principal, time_slice, product_type_name, env_id)
+        usage_cost (float): Additional Usage cost for the key
+        shared_cost (float): Additional Shared cost for the key
+    """
+    curr_usage_cost = usage_dataset.get(row_key)
+    if curr_usage_cost is None:
+        # First time this key is seen, so it is also registered in its timestamp bucket for the cleanup.
+        usage_dataset[row_key] = usage_cost
+        shared_dataset[row_key] = shared_cost
+        ts_buckets[row_key[1]].add(row_key)
+    else:
+        usage_dataset[row_key] = curr_usage_cost + usage_cost
+        shared_dataset[row_key] += shared_cost
+
+
 @dataclass(kw_only=True)
 class CCloudChargebackHandler(AbstractDataHandler):
     billing_dataset: CCloudBillingHandler = field(init=True)
@@ -62,11 +101,18 @@ class CCloudChargebackHandler(AbstractDataHandler):
     start_date: datetime.datetime = field(init=True)
     days_per_query: int = field(default=7)
     max_days_in_memory: int = field(default=14)
+    exact_decimal: bool = field(default=False)
 
     last_available_date: datetime.datetime = field(init=False)
-    chargeback_dataset: Dict = field(init=False, repr=False, default_factory=dict)
+    chargeback_usage_dataset: Dict = field(init=False, repr=False, default_factory=dict)
+    chargeback_shared_dataset: Dict = field(init=False, repr=False, default_factory=dict)
+    chargeback_ts_buckets: Dict[datetime.datetime, Set[Tuple]] = field(
+        init=False, repr=False, default_factory=lambda: defaultdict(set)
+    )
     curr_export_datetime: datetime.datetime = field(init=False)
     metrics_collector: TimestampedCollector = field(init=False)
+    ptype_handlers: Dict[str, Callable] = field(init=False, repr=False)
+    prom_exposed_labels: Set[Tuple[str, str, str, str]] = field(init=False, repr=False, default_factory=set)
 
     def __post_init__(self) -> None:
         """Initialize the Chargeback handler:
@@ -82,6 +128,25 @@ class CCloudChargebackHandler(AbstractDataHandler):
         # )
         # Calculate the end_date from start_date plus number of days per query
         self.last_available_date = self.start_date + datetime.timedelta(days=self.days_per_query)
+        # Product Type to calculation method mapping used by compute_output for dispatching the billing rows
+        self.ptype_handlers = {
+            "KAFKA_BASE": self.__compute_kafka_base,
+            "KAFKA_NETWORK_READ": self.__compute_kafka_network_read,
+            "KAFKA_NETWORK_WRITE": self.__compute_kafka_network_write,
+            "KAFKA_NUM_CKUS": self.__compute_kafka_num_ckus,
+            "KAFKA_PARTITION": self.__compute_kafka_partition_storage,
+            "KAFKA_STORAGE": self.__compute_kafka_partition_storage,
+            "AUDIT_LOG_READ": self.__compute_audit_log_read,
+            "CONNECT_CAPACITY": self.__compute_connect_capacity,
+            "CONNECT_NUM_TASKS": self.__compute_connect_tasks_throughput,
+            "CONNECT_THROUGHPUT": self.__compute_connect_tasks_throughput,
+            "CLUSTER_LINKING_PER_LINK": self.__compute_cluster_linking,
+            "CLUSTER_LINKING_READ": self.__compute_cluster_linking,
+            "CLUSTER_LINKING_WRITE": self.__compute_cluster_linking,
+            "GOVERNANCE_BASE": self.__compute_governance_schema_registry,
+            "SCHEMA_REGISTRY": self.__compute_governance_schema_registry,
+            "KSQL_NUM_CSUS": self.__compute_ksql_num_csus,
+        }
         self.read_all(start_date=self.start_date, end_date=self.last_available_date)
         # self.attach(chargeback_prom_metrics)
         self.curr_export_datetime = self.start_date
@@ -110,49 +175,66 @@ class CCloudChargebackHandler(AbstractDataHandler):
             ts_filter (pd.Timestamp): This Timestamp allows us to filter the data from the entire data set
             to a specific timestamp and expose it to the prometheus collector
         """
-        LOGGER.info(f"Currently reading the Chargeback dataset for Timestamp: {ts_filter.to_pydatetime()}")
+        LOGGER.info("Currently reading the Chargeback dataset for Timestamp: %s", ts_filter)
         # chargeback_prom_status_metrics.clear()
         # chargeback_prom_status_metrics.set(1)
-        self.force_clear_prom_metrics()
         out, is_none = self._get_dataset_for_exact_timestamp(
             dataset=self.get_chargeback_dataframe(), ts_column_name=CHARGEBACK_COLUMNS.TS, time_slice=ts_filter
         )
-        if not is_none:
-            for df_row in out.itertuples(name="ChargeBackData"):
-                principal_id = df_row[0][0]
-                product_type = df_row[0][2]
-                env_id = df_row[0][3]
-                usage_cost = df_row[1]
-                shared_cost = df_row[2]
-
-                chargeback_prom_metrics.labels(principal_id, product_type, env_id, CHARGEBACK_COLUMNS.USAGE_COST).set(
-                    usage_cost
-                )
-                chargeback_prom_metrics.labels(principal_id, product_type, env_id, CHARGEBACK_COLUMNS.SHARED_COST).set(
-                    shared_cost
-                )
+        exposed_labels = set()
+        if not is_none and not out.empty:
+            out = out.reset_index()
+            # Pull the columns out once as arrays instead of building a namedtuple for every row
+            for principal_id, product_type, env_id, usage_cost, shared_cost in zip(
+                out[CHARGEBACK_COLUMNS.PRINCIPAL].to_numpy(),
+                out[CHARGEBACK_COLUMNS.PRODUCT_TYPE].to_numpy(),
+                out[CHARGEBACK_COLUMNS.ENV_ID].to_numpy(),
+                out[CHARGEBACK_COLUMNS.USAGE_COST].to_numpy(),
+                out[CHARGEBACK_COLUMNS.SHARED_COST].to_numpy(),
+            ):
+                for cost_type, cost in [
+                    (CHARGEBACK_COLUMNS.USAGE_COST, usage_cost),
+                    (CHARGEBACK_COLUMNS.SHARED_COST, shared_cost),
+                ]:
+                    label_values = (principal_id, product_type, env_id, cost_type)
+                    chargeback_prom_metrics.labels(*label_values).set(cost)
+                    exposed_labels.add(label_values)
+        # Only the label sets exposed by this handler that are not available for this timestamp are removed instead of
+        # clearing out the whole collector. The collector is shared by every org, so another handler might have
+        # cleared it already; those label sets are no longer there and are skipped.
+        for label_values in self.prom_exposed_labels - exposed_labels:
+            try:
+                chargeback_prom_metrics.remove(*label_values)
+            except KeyError:
+                pass
+        self.prom_exposed_labels = exposed_labels
 
     @logged_method
     def force_clear_prom_metrics(self):
         chargeback_prom_metrics.clear()
+        self.prom_exposed_labels.clear()
 
     @logged_method
     def read_all(self, start_date: datetime.datetime, end_date: datetime.datetime, **kwargs):
-        """Iterate through all the timestamps in the datetime range and calculate the chargeback for that timestamp
+        """Calculate the chargeback for all the timestamps in the datetime range in a single batch
 
         Args:
             start_date (datetime.datetime): Inclusive datetime for the period beginning
             end_date (datetime.datetime): Exclusive datetime for the period ending
         """
-        for time_slice_item in self._generate_date_range_per_row(start_date=start_date, end_date=end_date):
-            self.compute_output(time_slice=time_slice_item)
+        time_slices = self._generate_date_range_per_row(start_date=start_date, end_date=end_date)
+        if len(time_slices) > 0:
+            self.compute_output_batch(start_date=time_slices[0], end_date=time_slices[-1] + datetime.timedelta(hours=1))
 
     @logged_method
     def cleanup_old_data(self, retention_start_date: datetime.datetime):
-        """Cleanup the older dataset from the chargeback object and prevent it from using too much memory"""
-        for (k1, k2, k3, k4), (_, _) in self.chargeback_dataset.copy().items():
-            if k2 < retention_start_date:
-                del self.chargeback_dataset[(k1, k2, k3, k4)]
+        """Cleanup the older dataset from the chargeback object and prevent it from using too much memory.
+        The keys are tracked per timestamp bucket, so only the expired keys are visited.
+        """
+        for ts in [x for x in self.chargeback_ts_buckets.keys() if x < retention_start_date]:
+            for row_key in self.chargeback_ts_buckets.pop(ts):
+                del self.chargeback_usage_dataset[row_key]
+                del self.chargeback_shared_dataset[row_key]
 
     @logged_method
     def read_next_dataset(self, exposed_timestamp: datetime.datetime):
@@ -186,42 +268,26 @@ class CCloudChargebackHandler(AbstractDataHandler):
         )
 
     @logged_method
-    def __add_cost_to_chargeback_dataset(
-        self,
-        principal: str,
-        time_slice: datetime.datetime,
-        product_type_name: str,
-        env_id: str,
-        additional_usage_cost: decimal.Decimal = decimal.Decimal(0),
-        additional_shared_cost: decimal.Decimal = decimal.Decimal(0),
-    ):
-        """Internal chargeback Data structure to hold all the calculated chargeback data in memory.
-        As the column names & values were needed to be dynamic, we did not use a dataframe here for ease of use.
+    def __get_output_costs(self, costs: List[float]) -> List:
+        """Convert the float64 costs held in the chargeback dataset to the values handed out to the consumers.
 
         Args:
-            principal (str): The Principal used for Chargeback Aggregation -- Primary Complex key
-            time_slice (datetime.datetime): datetime of the Hour used for chargeback aggregation -- Primary complex key
-            product_type_name (str): The different product names available in CCloud for aggregation
-            additional_usage_cost (decimal.Decimal, optional): Is the cost Usage cost for that product type and what is the total usage cost for that duration? Defaults to decimal.Decimal(0).
-            additional_shared_cost (decimal.Decimal, optional): Is the cost Shared cost for that product type and what is the total shared cost for that duration. Defaults to decimal.Decimal(0).
+            costs (List[float]): Costs from chargeback_usage_dataset or chargeback_shared_dataset
+
+        Returns:
+            List: The costs as Decimal rounded to 6 decimal places if exact_decimal is set, otherwise the floats as is
         """
-        row_key = (principal, time_slice, product_type_name, env_id)
-        if row_key in self.chargeback_dataset:
-            u, s = self.chargeback_dataset[row_key]
-            self.chargeback_dataset[row_key] = (
-                u + additional_usage_cost,
-                s + additional_shared_cost,
-            )
-        else:
-            self.chargeback_dataset[row_key] = (
-                additional_usage_cost,
-                additional_shared_cost,
-            )
+        if self.exact_decimal:
+            return [decimal.Decimal(f"{x:.6f}") for x in costs]
+        return costs
 
     @logged_method
     def get_chargeback_dataset(self):
         temp_ds = []
-        for (principal, ts, product_type, env_id), (usage, shared) in self.chargeback_dataset.items():
+        row_keys = list(self.chargeback_usage_dataset.keys())
+        usage_costs = self.__get_output_costs([self.chargeback_usage_dataset[x] for x in row_keys])
+        shared_costs = self.__get_output_costs([self.chargeback_shared_dataset[x] for x in row_keys])
+        for (principal, ts, product_type, env_id), usage, shared in zip(row_keys, usage_costs, shared_costs):
             next_ts = self._generate_next_timestamp(curr_date=ts, position=0)
             temp_dict = {
                 CHARGEBACK_COLUMNS.PRINCIPAL: principal,
@@ -236,475 +302,590 @@ class CCloudChargebackHandler(AbstractDataHandler):
 
     @logged_method
     def get_chargeback_dataframe(self) -> pd.DataFrame:
-        """Generate pandas Dataframe for the Chargeback data available in memory within attribute chargeback_dataset
+        """Generate pandas Dataframe for the Chargeback data available in memory within attributes chargeback_usage_dataset & chargeback_shared_dataset
 
         Returns:
             pd.DataFrame: _description_
         """
-        # TODO: Getting this dataframe is amazingly under optimized albeit uses yield.
-        # Uses an intermittent list of dict conversion and then another step to convert to dataframe
-        # No clue at the moment on how to improve this.
-        out_ds = self.get_chargeback_dataset()
-        temp = pd.DataFrame.from_records(
-            out_ds,
-            index=[
+        # The frame is built column wise straight from the dict keys & values. Every key part is encoded to integer
+        # codes over its sorted unique values, so the MultiIndex is created from the codes directly and only the unique
+        # timestamps need a datetime conversion. The levels are sorted & missing key parts (e.g. a connector without an
+        # owner) get the -1 code, the same way MultiIndex.from_arrays would build them.
+        row_keys = list(self.chargeback_usage_dataset.keys())
+        usage_costs = self.__get_output_costs([self.chargeback_usage_dataset[x] for x in row_keys])
+        shared_costs = self.__get_output_costs([self.chargeback_shared_dataset[x] for x in row_keys])
+        level_codes, level_values = [], []
+        for key_values in zip(*row_keys) if row_keys else ([], [], [], []):
+            uniques = sorted({x for x in key_values if x is not None})
+            positions = {x: i for i, x in enumerate(uniques)}
+            level_codes.append([positions.get(x, -1) for x in key_values])
+            level_values.append(uniques)
+        level_values[1] = pd.to_datetime(level_values[1], utc=True)
+        chargeback_index = pd.MultiIndex(
+            levels=level_values,
+            codes=level_codes,
+            names=[
                 CHARGEBACK_COLUMNS.PRINCIPAL,
                 CHARGEBACK_COLUMNS.TS,
                 CHARGEBACK_COLUMNS.PRODUCT_TYPE,
                 CHARGEBACK_COLUMNS.ENV_ID,
             ],
         )
-        return temp
+        return pd.DataFrame(
+            {CHARGEBACK_COLUMNS.USAGE_COST: usage_costs, CHARGEBACK_COLUMNS.SHARED_COST: shared_costs},
+            index=chargeback_index,
+        )
 
     @logged_method
     def compute_output(
         self,
         time_slice: datetime.datetime,
     ):
-        """The core calculation method. This method aggregates all the costs on a per product type basis for every principal per hour and appends that calculated dataset in chargeback_dataset object attribute
+        """Calculate the chargeback for a single hour. This is a wrapper over compute_output_batch for that time slice.
 
         Args:
             time_slice (datetime.datetime): The exact timestamp for which the compute will happen
         """
-        billing_data = self.billing_dataset.get_dataset_for_time_slice(time_slice=time_slice)
-        metrics_data = self.metrics_dataset.get_dataset_for_time_slice(time_slice=time_slice)
-        for bill_row in billing_data.itertuples(index=True, name="BillingRow"):
-            row_ts, row_env, row_cid, row_pname, row_ptype = (
-                bill_row.Index[0].to_pydatetime(),
-                bill_row.Index[1],
-                bill_row.Index[2],
-                bill_row.Index[3],
-                bill_row.Index[4],
-            )
+        self.compute_output_batch(start_date=time_slice, end_date=time_slice + datetime.timedelta(hours=1))
 
-            df_time_slice = pd.Timestamp(time_slice)
-
-            row_cname = getattr(bill_row, BILLING_API_COLUMNS.cluster_name)
-            row_cost = getattr(bill_row, BILLING_API_COLUMNS.calc_split_total)
-            if row_ptype == "KAFKA_BASE":
-                # GOAL: Split Cost equally across all the SA/Users that have API Keys for that Kafka Cluster
-                # Find all active Service Accounts/Users For kafka Cluster using the API Keys in the system.
-                sa_count = self.objects_dataset.cc_api_keys.find_sa_count_for_clusters(cluster_id=row_cid)
-                if len(sa_count) > 0:
-                    splitter = len(sa_count)
-                    # Add Shared Cost for all active SA/Users in the cluster and split it equally
-                    for sa_name, sa_api_key_count in sa_count.items():
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=sa_name,
-                            time_slice=row_ts,
-                            env_id=row_env,
-                            product_type_name=row_ptype,
-                            additional_shared_cost=decimal.Decimal(row_cost) / decimal.Decimal(splitter),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- No API Keys available for cluster {row_cid}. Attributing {row_ptype} for {row_cid} as Cluster Shared Cost"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_cid,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost),
-                    )
-            elif row_ptype == "KAFKA_NETWORK_READ":
-                # GOAL: Split cost across all the consumers to that cluster as a ratio of consumption performed.
-                # Read Depends in the Response_Bytes Metric Only
-                col_name = METRICS_API_PROMETHEUS_QUERIES.response_bytes_name
-                # filter metrics for data that has some consumption > 0 , and then find all rows with index
-                # with that timestamp and that specific kafka cluster.
-                try:
-                    subset = metrics_data[metrics_data[col_name] > 0][
-                        [
-                            METRICS_API_COLUMNS.timestamp,
-                            METRICS_API_COLUMNS.cluster_id,
-                            METRICS_API_COLUMNS.principal_id,
-                            col_name,
-                        ]
-                    ]
-                    metric_rows = subset[
-                        (subset[METRICS_API_COLUMNS.timestamp] == df_time_slice)
-                        & (subset[METRICS_API_COLUMNS.cluster_id] == row_cid)
-                    ]
-                except KeyError:
-                    metric_rows = pd.DataFrame()
-                if not metric_rows.empty:
-                    # Find the total consumption during that time slice
-                    agg_data = metric_rows[[col_name]].agg(["sum"])
-                    # add the Ratio consumption column by dividing every row by total consumption.
-                    metric_rows[f"{col_name}_ratio"] = metric_rows[col_name].transform(
-                        lambda x: decimal.Decimal(x) / decimal.Decimal(agg_data.loc[["sum"]][col_name])
-                    )
-                    # for every filtered Row , add consumption
-                    for metric_row in metric_rows.itertuples(index=True, name="MetricsRow"):
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=getattr(metric_row, METRICS_API_COLUMNS.principal_id),
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_usage_cost=decimal.Decimal(row_cost)
-                            * decimal.Decimal(getattr(metric_row, f"{col_name}_ratio")),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- Could not map {row_ptype} for {row_cid}. Attributing as Cluster Shared Cost for cluster {row_cid}"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_cid,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost),
-                    )
-            elif row_ptype == "KAFKA_NETWORK_WRITE":
-                # GOAL: Split cost across all the producers to that cluster as a ratio of production performed.
-                # Read Depends in the Response_Bytes Metric Only
-                col_name = METRICS_API_PROMETHEUS_QUERIES.request_bytes_name
-                # filter metrics for data that has some consumption > 0 , and then find all rows with index
-                # with that timestamp and that specific kafka cluster.
-                try:
-                    subset = metrics_data[metrics_data[col_name] > 0][
-                        [
-                            METRICS_API_COLUMNS.timestamp,
-                            METRICS_API_COLUMNS.cluster_id,
-                            METRICS_API_COLUMNS.principal_id,
-                            col_name,
-                        ]
-                    ]
-                    metric_rows = subset[
-                        (subset[METRICS_API_COLUMNS.timestamp] == df_time_slice)
-                        & (subset[METRICS_API_COLUMNS.cluster_id] == row_cid)
-                    ]
-                except KeyError:
-                    metric_rows = pd.DataFrame()
-                if not metric_rows.empty:
-                    # print(metric_rows.info())
-                    # Find the total consumption during that time slice
-                    agg_value = metric_rows[[col_name]].agg(["sum"]).loc["sum", col_name]
-                    # add the Ratio consumption column by dividing every row by total consumption.
-                    metric_rows[f"{col_name}_ratio"] = (
-                        metric_rows[col_name]
-                        .transform(lambda x: decimal.Decimal(x) / decimal.Decimal(agg_value))
-                        .to_list()
-                    )
-                    # for every filtered Row , add consumption
-                    for metric_row in metric_rows.itertuples(index=True, name="MetricsRow"):
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=getattr(metric_row, METRICS_API_COLUMNS.principal_id),
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_usage_cost=decimal.Decimal(row_cost)
-                            * decimal.Decimal(getattr(metric_row, f"{col_name}_ratio")),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- Could not map {row_ptype} for {row_cid}. Attributing as Cluster Shared Cost for cluster {row_cid}"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_cid,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost),
-                    )
-            elif row_ptype == "KAFKA_NUM_CKUS":
-                # GOAL: Split into 2 Categories --
-                #       Common Charge -- Flat 50% of the cost Divided across all clients active in that duration.
-                #       Usage Charge  -- 50% of the cost split variably by the amount of data produced + consumed by the SA/User
-                common_charge_ratio = 0.30
-                usage_charge_ratio = 0.70
-                # Common Charge will be added as a ratio of the count of API Keys created for each service account.
-                sa_count = self.objects_dataset.cc_api_keys.find_sa_count_for_clusters(cluster_id=row_cid)
-                if len(sa_count) > 0:
-                    splitter = len(sa_count)
-                    # total_api_key_count = len(
-                    #     [x for x in self.cc_objects.cc_api_keys.api_keys.values() if x.cluster_id != "cloud"]
-                    # )
-                    for sa_name, sa_api_key_count in sa_count.items():
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=sa_name,
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_shared_cost=(decimal.Decimal(row_cost) * decimal.Decimal(common_charge_ratio))
-                            / decimal.Decimal(splitter),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- No API Keys were found for cluster {row_cid}. Attributing Common Cost component for {row_ptype} as Cluster Shared Cost for cluster {row_cid}"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_cid,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost) * decimal.Decimal(common_charge_ratio),
-                    )
-                # filter metrics for data that has some consumption > 0 , and then find all rows with index
-                # with that timestamp and that specific kafka cluster.
-                try:
-                    metric_rows = metrics_data[
-                        (metrics_data[METRICS_API_COLUMNS.timestamp] == df_time_slice)
-                        & (metrics_data[METRICS_API_COLUMNS.cluster_id] == row_cid)
-                    ]
-                except KeyError:
-                    metric_rows = pd.DataFrame()
-                # Usage Charge
-                if not metric_rows.empty:
-                    # Find the total consumption during that time slice
-                    query_dataset = [
-                        METRICS_API_PROMETHEUS_QUERIES.request_bytes_name,
-                        METRICS_API_PROMETHEUS_QUERIES.response_bytes_name,
-                    ]
-
-                    agg_data = metric_rows[query_dataset].agg(["sum"])
-                    # add the Ratio consumption column by dividing every row by total consumption.
-                    for metric_item in query_dataset.values():
-                        metric_rows[f"{metric_item}_ratio"] = metric_rows[metric_item].transform(
-                            lambda x: decimal.Decimal(x) / decimal.Decimal(agg_data.loc[["sum"]][metric_item])
-                        )
-                    # for every filtered Row , add consumption
-                    for metric_row in metric_rows.itertuples(index=True, name="MetricsRow"):
-                        req_cost = (
-                            row_cost
-                            / len(query_dataset)
-                            * getattr(metric_row, f"{METRICS_API_PROMETHEUS_QUERIES.request_bytes_name}_ratio")
-                        )
-                        res_cost = (
-                            row_cost
-                            / len(query_dataset)
-                            * getattr(metric_row, f"{METRICS_API_PROMETHEUS_QUERIES.response_bytes_name}_ratio")
-                        )
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=getattr(metric_row, METRICS_API_COLUMNS.principal_id),
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            # additional_shared_cost=(common_charge_ratio * row_cost) / metric_rows.size,
-                            additional_usage_cost=decimal.Decimal(usage_charge_ratio)
-                            * (decimal.Decimal(req_cost) + decimal.Decimal(res_cost)),
-                        )
-                else:
-                    if len(sa_count) > 0:
-                        # print(
-                        #     f"Row TS: {str(row_ts)} -- No Production/Consumption activity for cluster {row_cid}. Splitting Usage Ratio for {row_ptype} across all Service Accounts as Shared Cost"
-                        # )
-                        splitter = len(sa_count)
-                        for sa_name, sa_api_key_count in sa_count.items():
-                            self.__add_cost_to_chargeback_dataset(
-                                principal=sa_name,
-                                time_slice=row_ts,
-                                product_type_name=row_ptype,
-                                env_id=row_env,
-                                additional_shared_cost=(
-                                    decimal.Decimal(row_cost) * decimal.Decimal(usage_charge_ratio)
-                                )
-                                / decimal.Decimal(splitter),
-                            )
-                    else:
-                        # print(
-                        #     f"Row TS: {str(row_ts)} -- No Production/Consumption activity for cluster {row_cid} and no API Keys found for the cluster {row_cid}. Attributing Common Cost component for {row_ptype} as Cluster Shared Cost for cluster {row_cid}"
-                        # )
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=row_cid,
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_shared_cost=decimal.Decimal(row_cost) * decimal.Decimal(usage_charge_ratio),
-                        )
-            elif row_ptype in ["KAFKA_PARTITION", "KAFKA_STORAGE"]:
-                # GOAL: Split cost across all the API Key holders for the specific Cluster
-                # Find all active Service Accounts/Users For kafka Cluster using the API Keys in the system.
-                sa_count = self.objects_dataset.cc_api_keys.find_sa_count_for_clusters(cluster_id=row_cid)
-                if len(sa_count) > 0:
-                    splitter = len(sa_count)
-                    # Add Shared Cost for all active SA/Users in the cluster and split it equally
-                    for sa_name, sa_api_key_count in sa_count.items():
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=sa_name,
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_shared_cost=decimal.Decimal(row_cost) / decimal.Decimal(splitter),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- No API Keys available for cluster {row_cid}. Attributing {row_ptype}  for {row_cid} as Cluster Shared Cost"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_cid,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost),
-                    )
-            elif row_ptype == "AUDIT_LOG_READ":
-                # GOAL: Split Audit Log read cost across all the Service Accounts + Users that are created in the Org
-                # Find all active Service Accounts/Users in the system.
-                active_identities = list(self.objects_dataset.cc_sa.sa.keys()) + list(
-                    self.objects_dataset.cc_users.users.keys()
-                )
-                splitter = len(active_identities)
-                # Add Shared Cost for all active SA/Users in the cluster and split it equally
-                for identity_item in active_identities:
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=identity_item,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost) / decimal.Decimal(splitter),
-                    )
-            elif row_ptype == "CONNECT_CAPACITY":
-                # GOAL: Split the Connect Cost across all the connect Service Accounts active in the cluster
-                active_identities = set(
-                    [
-                        y.owner_id
-                        for x, y in self.objects_dataset.cc_connectors.connectors.items()
-                        if y.cluster_id == row_cid
-                    ]
-                )
-                if len(active_identities) > 0:
-                    splitter = len(active_identities)
-                    for identity_item in active_identities:
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=identity_item,
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_shared_cost=decimal.Decimal(row_cost) / decimal.Decimal(splitter),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- No Connector Details were found. Attributing as Shared Cost for Kafka Cluster {row_cid}"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_cid,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost),
-                    )
-            elif row_ptype in ["CONNECT_NUM_TASKS", "CONNECT_THROUGHPUT"]:
-                # GOAL: Cost will be assumed by the owner of the connector
-                # There will be only one active Identity but we will still loop on the identity for consistency
-                # The conditions are checking for the specific connector in an environment and trying to find its owner.
-                active_identities = set(
-                    [
-                        y.owner_id
-                        for x, y in self.objects_dataset.cc_connectors.connectors.items()
-                        if y.env_id == row_env and y.connector_name == row_cname
-                    ]
-                )
-                if len(active_identities) > 0:
-                    splitter = len(active_identities)
-                    for identity_item in active_identities:
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=identity_item,
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_usage_cost=decimal.Decimal(row_cost) / decimal.Decimal(splitter),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- No Connector Details were found. Using the Connector {row_cid} and adding cost as Shared Cost"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_cid,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost),
-                    )
-            elif row_ptype == "CLUSTER_LINKING_PER_LINK":
-                # GOAL: Cost will be assumed by the Logical Cluster ID listed in the Billing API
-                self.__add_cost_to_chargeback_dataset(
-                    principal=row_cid,
-                    time_slice=row_ts,
-                    product_type_name=row_ptype,
-                    env_id=row_env,
-                    additional_shared_cost=decimal.Decimal(row_cost),
-                )
-            elif row_ptype == "CLUSTER_LINKING_READ":
-                # GOAL: Cost will be assumed by the Logical Cluster ID listed in the Billing API
-                self.__add_cost_to_chargeback_dataset(
-                    principal=row_cid,
-                    time_slice=row_ts,
-                    product_type_name=row_ptype,
-                    env_id=row_env,
-                    additional_shared_cost=decimal.Decimal(row_cost),
-                )
-            elif row_ptype == "CLUSTER_LINKING_WRITE":
-                # GOAL: Cost will be assumed by the Logical Cluster ID listed in the Billing API
-                self.__add_cost_to_chargeback_dataset(
-                    principal=row_cid,
-                    time_slice=row_ts,
-                    product_type_name=row_ptype,
-                    env_id=row_env,
-                    additional_shared_cost=decimal.Decimal(row_cost),
-                )
-            elif row_ptype in ["GOVERNANCE_BASE", "SCHEMA_REGISTRY"]:
-                # GOAL: Cost will be equally spread across all the Kafka Clusters existing in this CCloud Environment
-                active_identities = set(
-                    [y.cluster_id for x, y in self.objects_dataset.cc_clusters.clusters.items() if y.env_id == row_env]
-                )
-                if len(active_identities) > 0:
-                    splitter = len(active_identities)
-                    for identity_item in active_identities:
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=identity_item,
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_usage_cost=decimal.Decimal(row_cost) / decimal.Decimal(splitter),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- No Kafka Clusters present within the environment. Attributing as Shared Cost to {row_env}"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_env,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost),
-                    )
-            elif row_ptype == "KSQL_NUM_CSUS":
-                # GOAL: Cost will be assumed by the ksql Service Account/User being used by the ksqldb cluster
-                # There will be only one active Identity but we will still loop on the identity for consistency
-                # The conditions are checking for the specific ksqldb cluster in an environment and trying to find its owner.
-                active_identities = set(
-                    [
-                        y.owner_id
-                        for x, y in self.objects_dataset.cc_ksqldb_clusters.ksqldb_clusters.items()
-                        if y.cluster_id == row_cid
-                    ]
-                )
-                if len(active_identities) > 0:
-                    splitter = len(active_identities)
-                    for identity_item in active_identities:
-                        self.__add_cost_to_chargeback_dataset(
-                            principal=identity_item,
-                            time_slice=row_ts,
-                            product_type_name=row_ptype,
-                            env_id=row_env,
-                            additional_usage_cost=decimal.Decimal(row_cost) / decimal.Decimal(splitter),
-                        )
-                else:
-                    # print(
-                    #     f"Row TS: {str(row_ts)} -- No KSQL Cluster Details were found. Attributing as Shared Cost for ksqlDB cluster ID {row_cid}"
-                    # )
-                    self.__add_cost_to_chargeback_dataset(
-                        principal=row_cid,
-                        time_slice=row_ts,
-                        product_type_name=row_ptype,
-                        env_id=row_env,
-                        additional_shared_cost=decimal.Decimal(row_cost),
-                    )
+    @logged_method
+    def compute_output_batch(
+        self,
+        start_date: datetime.datetime,
+        end_date: datetime.datetime,
+    ):
+        """The core calculation method. This method aggregates all the costs on a per product type basis for every principal per hour and appends that calculated dataset in chargeback_usage_dataset & chargeback_shared_dataset object attributes.
+        All the hours in the range are calculated together, so every product type handler is only called once per batch.
+
+        Args:
+            start_date (datetime.datetime): Inclusive datetime for the period beginning
+            end_date (datetime.datetime): Exclusive datetime for the period ending
+        """
+        billing_data, is_none = self.billing_dataset.get_dataset_for_timerange(
+            start_datetime=start_date, end_datetime=end_date
+        )
+        if is_none or billing_data.empty:
+            return
+        # Zero cost rows do not add anything to the chargeback, so they are dropped before any of the handlers run.
+        billing_data = billing_data[billing_data[BILLING_API_COLUMNS.calc_split_total] != 0]
+        if billing_data.empty:
+            return
+        metrics_data, _ = self.metrics_dataset.get_dataset_for_timerange(
+            start_datetime=start_date, end_datetime=end_date
+        )
+        # API Key owners per cluster do not change within a compute cycle, so they are only looked up once per cluster.
+        sa_count_cache: Dict[str, Dict[str, int]] = {}
+        # The metrics are flattened, filtered for activity and the activity ratios calculated once per batch.
+        active_metrics = self.__get_active_metrics(metrics_data=metrics_data)
+        # Split the billing rows by product type and hand every group over to its handler in one go.
+        for row_ptype, billing_rows in billing_data.groupby(level=BILLING_API_COLUMNS.product_type, sort=False):
+            ptype_handler = self.ptype_handlers.get(row_ptype)
+            if ptype_handler is not None:
+                ptype_handler(billing_rows=billing_rows, active_metrics=active_metrics, sa_count_cache=sa_count_cache)
             else:
-                print("=" * 80)
-                print(
-                    f"Row TS: {str(row_ts)} -- No Chargeback calculation available for {row_ptype}. Please request for it to be added."
+                LOGGER.warning(
+                    "Time Range: %s - %s -- No Chargeback calculation available for %s. Please request for it to be added.",
+                    start_date,
+                    end_date,
+                    row_ptype,
+                )
+
+    @logged_method
+    def __find_sa_count_for_clusters(
+        self, cluster_id: str, sa_count_cache: Dict[str, Dict[str, int]]
+    ) -> Dict[str, int]:
+        """Memoized wrapper over find_sa_count_for_clusters from the API Keys dataset.
+
+        Args:
+            cluster_id (str): The Kafka cluster ID for which the API Key owners are required
+            sa_count_cache (Dict[str, Dict[str, int]]): The cache used for the current compute cycle
+
+        Returns:
+            Dict[str, int]: API Key count per owner for the cluster
+        """
+        sa_count = sa_count_cache.get(cluster_id)
+        if sa_count is None:
+            sa_count = self.objects_dataset.cc_api_keys.find_sa_count_for_clusters(cluster_id=cluster_id)
+            sa_count_cache[cluster_id] = sa_count
+        return sa_count
+
+    @logged_method
+    def __get_connector_owners(self) -> Tuple[Dict[str, Set[str]], Dict[Tuple[str, str], Set[str]]]:
+        """Index the connector owners by the kafka cluster and by the (environment, connector name) pair.
+        The indexes are built from the current objects dataset every time, so they follow the CCloud Objects refresh.
+
+        Returns:
+            Tuple[Dict[str, Set[str]], Dict[Tuple[str, str], Set[str]]]: owners per cluster_id & owners per (env_id, connector_name)
+        """
+        owners_by_cluster = defaultdict(set)
+        owners_by_env_name = defaultdict(set)
+        for connector in self.objects_dataset.cc_connectors.connectors.values():
+            owners_by_cluster[connector.cluster_id].add(connector.owner_id)
+            owners_by_env_name[(connector.env_id, connector.connector_name)].add(connector.owner_id)
+        return owners_by_cluster, owners_by_env_name
+
+    @logged_method
+    def __get_ksql_owners(self) -> Dict[str, FrozenSet[str]]:
+        """Index the ksqlDB cluster owners by the ksqlDB cluster ID in one pass over the ksqlDB clusters.
+
+        Returns:
+            Dict[str, FrozenSet[str]]: owners per ksqlDB cluster_id
+        """
+        owners_by_cid = defaultdict(set)
+        for ksql_cluster in self.objects_dataset.cc_ksqldb_clusters.ksqldb_clusters.values():
+            owners_by_cid[ksql_cluster.cluster_id].add(ksql_cluster.owner_id)
+        return {x: frozenset(y) for x, y in owners_by_cid.items()}
+
+    @logged_method
+    def __get_kafka_clusters_by_env(self) -> Dict[str, FrozenSet[str]]:
+        """Index the Kafka cluster IDs by the environment ID in one pass over the Kafka clusters.
+
+        Returns:
+            Dict[str, FrozenSet[str]]: Kafka cluster IDs per env_id
+        """
+        clusters_by_env = defaultdict(set)
+        for kafka_cluster in self.objects_dataset.cc_clusters.clusters.values():
+            clusters_by_env[kafka_cluster.env_id].add(kafka_cluster.cluster_id)
+        return {x: frozenset(y) for x, y in clusters_by_env.items()}
+
+    @logged_method
+    def __get_active_metrics(self, metrics_data: pd.DataFrame) -> pd.DataFrame:
+        """Flatten the metrics dataset, only retain the rows with some activity (value > 0) and calculate the ratio of
+        activity performed by every principal within that timestamp, cluster and query type.
+
+        Args:
+            metrics_data (pd.DataFrame | None): Metrics dataset with the Metrics API index
+
+        Returns:
+            pd.DataFrame: Flat dataframe with timestamp, query type, cluster id, principal id, value & ratio columns
+        """
+        if metrics_data is None or metrics_data.empty:
+            return pd.DataFrame(
+                {
+                    METRICS_API_COLUMNS.timestamp: pd.Series(dtype="datetime64[ns, UTC]"),
+                    METRICS_API_COLUMNS.query_type: pd.Series(dtype="object"),
+                    METRICS_API_COLUMNS.cluster_id: pd.Series(dtype="object"),
+                    METRICS_API_COLUMNS.principal_id: pd.Series(dtype="object"),
+                    METRICS_API_COLUMNS.value: pd.Series(dtype="float64"),
+                    "ratio": pd.Series(dtype="float64"),
+                }
+            )
+        out = metrics_data.reset_index()
+        out[METRICS_API_COLUMNS.value] = out[METRICS_API_COLUMNS.value].astype("float64")
+        out = out[out[METRICS_API_COLUMNS.value] > 0]
+        # Total activity per time slice, cluster & query type is calculated once and then used for every principal
+        total_activity = out.groupby(
+            [METRICS_API_COLUMNS.timestamp, METRICS_API_COLUMNS.cluster_id, METRICS_API_COLUMNS.query_type]
+        )[METRICS_API_COLUMNS.value].transform("sum")
+        return out.assign(ratio=out[METRICS_API_COLUMNS.value].to_numpy() / total_activity.to_numpy())
+
+    @logged_method
+    def __merge_billing_with_metrics(self, billing_rows: pd.DataFrame, active_metrics: pd.DataFrame) -> pd.DataFrame:
+        """Join the billing rows with the active metrics on (timestamp, cluster_id).
+
+        Args:
+            billing_rows (pd.DataFrame): Billing dataset rows with the Billing API index
+            active_metrics (pd.DataFrame): Output from __get_active_metrics
+
+        Returns:
+            pd.DataFrame: Billing rows joined with the metrics. Billing rows without any activity have NaN principal.
+        """
+        bill = billing_rows.reset_index()
+        bill[BILLING_API_COLUMNS.calc_split_total] = bill[BILLING_API_COLUMNS.calc_split_total].astype("float64")
+        return bill.merge(
+            active_metrics,
+            how="left",
+            left_on=[BILLING_API_COLUMNS.calc_timestamp, BILLING_API_COLUMNS.cluster_id],
+            right_on=[METRICS_API_COLUMNS.timestamp, METRICS_API_COLUMNS.cluster_id],
+        )
+
+    @logged_method
+    def __add_costs_to_chargeback_dataset(self, usage_costs: Dict[Tuple, float], shared_costs: Dict[Tuple, float]):
+        """Merge the locally accumulated costs into the chargeback dataset.
+        The handlers accumulate their costs per chargeback key first, so the dataset is only updated once for every
+        unique key instead of once for every billing row & identity.
+
+        Args:
+            usage_costs (Dict[Tuple, float]): Usage costs keyed by (principal, time_slice, product_type_name, env_id)
+            shared_costs (Dict[Tuple, float]): Shared costs keyed by (principal, time_slice, product_type_name, env_id)
+        """
+        usage_dataset, shared_dataset = self.chargeback_usage_dataset, self.chargeback_shared_dataset
+        ts_buckets = self.chargeback_ts_buckets
+        for row_key, usage_cost in usage_costs.items():
+            _add_cost(usage_dataset, shared_dataset, ts_buckets, row_key, usage_cost, shared_costs.get(row_key, 0.0))
+        for row_key, shared_cost in shared_costs.items():
+            if row_key not in usage_costs:
+                _add_cost(usage_dataset, shared_dataset, ts_buckets, row_key, 0.0, shared_cost)
+
+    @logged_method
+    def __add_cost_series_to_chargeback_dataset(self, cost_series: pd.Series, product_type_name: str, is_shared: bool):
+        """Add an aggregated cost series to the chargeback dataset.
+        The index levels and the costs are converted to arrays in one go, so the write back is a plain loop over
+        the already aggregated values without any per row Timestamp conversion.
+
+        Args:
+            cost_series (pd.Series): Cost series indexed by (principal, timestamp, env_id)
+            product_type_name (str): The product type the costs belong to
+            is_shared (bool): Add the costs as Shared costs if True, otherwise as Usage costs
+        """
+        if cost_series.empty:
+            return
+        # The cost groupbys keep missing principals (dropna=False) but surface them as NaN, so they are turned back
+        # into None to land on the same (None, ts, ptype, env) key as any other missing principal.
+        principals = cost_series.index.get_level_values(0).to_numpy(dtype=object)
+        principals[pd.isna(principals)] = None
+        costs = dict(
+            zip(
+                zip(
+                    principals,
+                    pd.DatetimeIndex(cost_series.index.get_level_values(1)).to_pydatetime(),
+                    repeat(product_type_name),
+                    cost_series.index.get_level_values(2).to_numpy(),
+                ),
+                cost_series.to_numpy(dtype="float64").tolist(),
+            )
+        )
+        if is_shared:
+            self.__add_costs_to_chargeback_dataset(usage_costs={}, shared_costs=costs)
+        else:
+            self.__add_costs_to_chargeback_dataset(usage_costs=costs, shared_costs={})
+
+    @logged_method
+    def __add_cost_split_across_identities(
+        self,
+        billing_rows: pd.DataFrame,
+        row_identities: List[Collection[str]],
+        fallback_principals: Iterable[str],
+        cost_ratio: float = 1.0,
+        is_shared: bool = True,
+    ):
+        """Split the cost of every billing row equally across the identities available for that row.
+        Billing rows without any identities are masked out upfront and attributed to their fallback principal as
+        Shared Cost, so only the rows with identities are exploded into one row per (billing row, identity) pair.
+        The split & the aggregation per principal are then done as a single vectorized pass for each of the two paths.
+
+        Args:
+            billing_rows (pd.DataFrame): Billing dataset rows with the Billing API index
+            row_identities (List[Collection[str]]): The identities for every billing row, in the billing rows order
+            fallback_principals (Iterable[str]): The principal for every billing row used when it has no identities
+            cost_ratio (float, optional): The part of the billing cost that is split. Defaults to 1.0.
+            is_shared (bool, optional): Add the split costs as Shared costs if True, otherwise as Usage costs. Defaults to True.
+        """
+        if billing_rows.empty:
+            return
+        row_ptype = billing_rows.index.get_level_values(BILLING_API_COLUMNS.product_type)[0]
+        has_identities = pd.Series([bool(x) for x in row_identities], dtype=bool).to_numpy()
+        row_costs = billing_rows[BILLING_API_COLUMNS.calc_split_total].astype("float64").to_numpy() * cost_ratio
+        row_timestamps = billing_rows.index.get_level_values(BILLING_API_COLUMNS.calc_timestamp)
+        row_env_ids = billing_rows.index.get_level_values(BILLING_API_COLUMNS.env_id)
+        group_keys = ["principal", BILLING_API_COLUMNS.calc_timestamp, BILLING_API_COLUMNS.env_id]
+        if not has_identities.all():
+            LOGGER.debug(
+                "No identities were found for %s billing rows of %s. Attributing them as Shared Cost to the fallback principal",
+                (~has_identities).sum(),
+                row_ptype,
+            )
+            fallback_rows = pd.DataFrame(
+                {
+                    "principal": pd.Index(fallback_principals)[~has_identities],
+                    BILLING_API_COLUMNS.calc_timestamp: row_timestamps[~has_identities],
+                    BILLING_API_COLUMNS.env_id: row_env_ids[~has_identities],
+                    "cost": row_costs[~has_identities],
+                }
+            )
+            self.__add_cost_series_to_chargeback_dataset(
+                cost_series=fallback_rows.groupby(group_keys, dropna=False)["cost"].sum(),
+                product_type_name=row_ptype,
+                is_shared=True,
+            )
+            if not has_identities.any():
+                return
+        row_principals = [tuple(x) for x, y in zip(row_identities, has_identities) if y]
+        splitters = [len(x) for x in row_principals]
+        if max(splitters) == 1:
+            # Every billing row belongs to a single principal, so nothing needs to be repeated or divided.
+            split_rows = pd.DataFrame(
+                {
+                    "principal": [x[0] for x in row_principals],
+                    BILLING_API_COLUMNS.calc_timestamp: row_timestamps[has_identities],
+                    BILLING_API_COLUMNS.env_id: row_env_ids[has_identities],
+                    "cost": row_costs[has_identities],
+                }
+            )
+        else:
+            # Every billing row is repeated once per principal, with the cost already divided by the splitter
+            split_rows = pd.DataFrame(
+                {
+                    "principal": list(chain.from_iterable(row_principals)),
+                    BILLING_API_COLUMNS.calc_timestamp: row_timestamps[has_identities].repeat(splitters),
+                    BILLING_API_COLUMNS.env_id: row_env_ids[has_identities].repeat(splitters),
+                    "cost": (row_costs[has_identities] / splitters).repeat(splitters),
+                }
+            )
+        self.__add_cost_series_to_chargeback_dataset(
+            cost_series=split_rows.groupby(group_keys, dropna=False)["cost"].sum(),
+            product_type_name=row_ptype,
+            is_shared=is_shared,
+        )
+
+    @logged_method
+    def __compute_kafka_base(self, billing_rows: pd.DataFrame, sa_count_cache: Dict[str, Dict[str, int]], **kwargs):
+        # GOAL: Split Cost equally across all the SA/Users that have API Keys for that Kafka Cluster
+        # Find all active Service Accounts/Users For kafka Cluster using the API Keys in the system.
+        # If No API Keys are available for the cluster, the cost is attributed as Cluster Shared Cost.
+        find_sa_count_for_clusters = self.__find_sa_count_for_clusters
+        cluster_ids = billing_rows.index.get_level_values(BILLING_API_COLUMNS.cluster_id)
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[
+                find_sa_count_for_clusters(cluster_id=x, sa_count_cache=sa_count_cache).keys() for x in cluster_ids
+            ],
+            fallback_principals=cluster_ids,
+        )
+
+    @logged_method
+    def __add_usage_cost_by_activity_ratio(
+        self,
+        billing_rows: pd.DataFrame,
+        active_metrics: pd.DataFrame,
+        query_types: List[str],
+        usage_charge_ratio: float = 1.0,
+    ) -> pd.DataFrame:
+        """Split the usage part of the billing rows across all the principals active on that cluster & timestamp.
+        The usage part is split equally between the active query types and then every principal gets the ratio of
+        its activity within that query type.
+
+        Args:
+            billing_rows (pd.DataFrame): Billing dataset rows with the Billing API index
+            active_metrics (pd.DataFrame): Output from __get_active_metrics
+            query_types (List[str]): The metrics query types that are used for the split
+            usage_charge_ratio (float, optional): The part of the billing cost that is split by usage. Defaults to 1.0.
+
+        Returns:
+            pd.DataFrame: The flattened billing rows that could not be mapped to any principal activity
+        """
+        # join the billing rows with the metrics data that has some activity > 0 on the timestamp & the kafka cluster.
+        merged = self.__merge_billing_with_metrics(
+            billing_rows=billing_rows,
+            active_metrics=active_metrics[active_metrics[METRICS_API_COLUMNS.query_type].isin(query_types)],
+        )
+        row_ptype = merged[BILLING_API_COLUMNS.product_type].iat[0]
+        is_mapped = merged[METRICS_API_COLUMNS.principal_id].notna()
+        usage = merged[is_mapped]
+        active_query_types = usage.groupby([BILLING_API_COLUMNS.calc_timestamp, BILLING_API_COLUMNS.cluster_id])[
+            METRICS_API_COLUMNS.query_type
+        ].transform("nunique")
+        usage = usage.assign(
+            usage_cost=usage[BILLING_API_COLUMNS.calc_split_total].to_numpy()
+            * usage_charge_ratio
+            / active_query_types.to_numpy()
+            * usage["ratio"].to_numpy()
+        )
+        self.__add_cost_series_to_chargeback_dataset(
+            cost_series=usage.groupby(
+                [
+                    METRICS_API_COLUMNS.principal_id,
+                    BILLING_API_COLUMNS.calc_timestamp,
+                    BILLING_API_COLUMNS.env_id,
+                ],
+                dropna=False,
+            )["usage_cost"].sum(),
+            product_type_name=row_ptype,
+            is_shared=False,
+        )
+        return merged[~is_mapped]
+
+    @logged_method
+    def __compute_kafka_network(self, billing_rows: pd.DataFrame, active_metrics: pd.DataFrame, col_name: str):
+        # GOAL: Split cost across all the clients of that cluster as a ratio of the consumption/production performed.
+        unmapped = self.__add_usage_cost_by_activity_ratio(
+            billing_rows=billing_rows, active_metrics=active_metrics, query_types=[col_name]
+        )
+        # Could not map the cost to any principal. Attributing as Cluster Shared Cost for that cluster.
+        self.__add_cost_series_to_chargeback_dataset(
+            cost_series=unmapped.groupby(
+                [
+                    BILLING_API_COLUMNS.cluster_id,
+                    BILLING_API_COLUMNS.calc_timestamp,
+                    BILLING_API_COLUMNS.env_id,
+                ],
+                dropna=False,
+            )[BILLING_API_COLUMNS.calc_split_total].sum(),
+            product_type_name=billing_rows.index.get_level_values(BILLING_API_COLUMNS.product_type)[0],
+            is_shared=True,
+        )
+
+    @logged_method
+    def __compute_kafka_network_read(self, billing_rows: pd.DataFrame, active_metrics: pd.DataFrame, **kwargs):
+        # Read Depends in the Response_Bytes Metric Only
+        self.__compute_kafka_network(
+            billing_rows=billing_rows,
+            active_metrics=active_metrics,
+            col_name=METRICS_API_PROMETHEUS_QUERIES.response_bytes_name,
+        )
+
+    @logged_method
+    def __compute_kafka_network_write(self, billing_rows: pd.DataFrame, active_metrics: pd.DataFrame, **kwargs):
+        # Write Depends in the Request_Bytes Metric Only
+        self.__compute_kafka_network(
+            billing_rows=billing_rows,
+            active_metrics=active_metrics,
+            col_name=METRICS_API_PROMETHEUS_QUERIES.request_bytes_name,
+        )
+
+    @logged_method
+    def __compute_kafka_num_ckus(
+        self,
+        billing_rows: pd.DataFrame,
+        active_metrics: pd.DataFrame,
+        sa_count_cache: Dict[str, Dict[str, int]],
+        **kwargs,
+    ):
+        # GOAL: Split into 2 Categories --
+        #       Common Charge -- Flat 30% of the cost Divided across all clients active in that duration.
+        #       Usage Charge  -- 70% of the cost split variably by the amount of data produced + consumed by the SA/User
+        common_charge_ratio = 0.30
+        usage_charge_ratio = 0.70
+        # Common Charge will be added as a ratio of the count of API Keys created for each service account.
+        # If No API Keys are found for the cluster, the Common Cost component is attributed as Cluster Shared Cost.
+        find_sa_count_for_clusters = self.__find_sa_count_for_clusters
+        cluster_ids = billing_rows.index.get_level_values(BILLING_API_COLUMNS.cluster_id)
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[
+                find_sa_count_for_clusters(cluster_id=x, sa_count_cache=sa_count_cache).keys() for x in cluster_ids
+            ],
+            fallback_principals=cluster_ids,
+            cost_ratio=common_charge_ratio,
+        )
+        # Usage Charge
+        # Split by the production + consumption ratio of every principal on the timestamp & the kafka cluster
+        unmapped = self.__add_usage_cost_by_activity_ratio(
+            billing_rows=billing_rows,
+            active_metrics=active_metrics,
+            query_types=[
+                METRICS_API_PROMETHEUS_QUERIES.request_bytes_name,
+                METRICS_API_PROMETHEUS_QUERIES.response_bytes_name,
+            ],
+            usage_charge_ratio=usage_charge_ratio,
+        ).set_index(
+            [
+                BILLING_API_COLUMNS.calc_timestamp,
+                BILLING_API_COLUMNS.env_id,
+                BILLING_API_COLUMNS.cluster_id,
+                BILLING_API_COLUMNS.product_name,
+                BILLING_API_COLUMNS.product_type,
+            ]
+        )
+        # No Production/Consumption activity for the cluster. The Usage Ratio is split across all Service Accounts
+        # as Shared Cost, or attributed as Cluster Shared Cost if no API Keys are found for the cluster either.
+        unmapped_cluster_ids = unmapped.index.get_level_values(BILLING_API_COLUMNS.cluster_id)
+        self.__add_cost_split_across_identities(
+            billing_rows=unmapped,
+            row_identities=[
+                find_sa_count_for_clusters(cluster_id=x, sa_count_cache=sa_count_cache).keys()
+                for x in unmapped_cluster_ids
+            ],
+            fallback_principals=unmapped_cluster_ids,
+            cost_ratio=usage_charge_ratio,
+        )
+
+    @logged_method
+    def __compute_kafka_partition_storage(
+        self, billing_rows: pd.DataFrame, sa_count_cache: Dict[str, Dict[str, int]], **kwargs
+    ):
+        # GOAL: Split cost across all the API Key holders for the specific Cluster
+        # Find all active Service Accounts/Users For kafka Cluster using the API Keys in the system.
+        # If No API Keys are available for the cluster, the cost is attributed as Cluster Shared Cost.
+        find_sa_count_for_clusters = self.__find_sa_count_for_clusters
+        cluster_ids = billing_rows.index.get_level_values(BILLING_API_COLUMNS.cluster_id)
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[
+                find_sa_count_for_clusters(cluster_id=x, sa_count_cache=sa_count_cache).keys() for x in cluster_ids
+            ],
+            fallback_principals=cluster_ids,
+        )
+
+    @logged_method
+    def __compute_audit_log_read(self, billing_rows: pd.DataFrame, **kwargs):
+        # GOAL: Split Audit Log read cost across all the Service Accounts + Users that are created in the Org
+        # Find all active Service Accounts/Users in the system.
+        active_identities = list(self.objects_dataset.cc_sa.sa.keys()) + list(
+            self.objects_dataset.cc_users.users.keys()
+        )
+        # Add Shared Cost for all active SA/Users and split it equally
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[active_identities] * len(billing_rows),
+            fallback_principals=billing_rows.index.get_level_values(BILLING_API_COLUMNS.cluster_id),
+        )
+
+    @logged_method
+    def __compute_connect_capacity(self, billing_rows: pd.DataFrame, **kwargs):
+        # GOAL: Split the Connect Cost across all the connect Service Accounts active in the cluster
+        # If No Connector Details are found, the cost is attributed as Shared Cost for the Kafka Cluster.
+        owners_by_cluster, _ = self.__get_connector_owners()
+        cluster_ids = billing_rows.index.get_level_values(BILLING_API_COLUMNS.cluster_id)
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[owners_by_cluster.get(x, EMPTY_FROZENSET) for x in cluster_ids],
+            fallback_principals=cluster_ids,
+        )
+
+    @logged_method
+    def __compute_connect_tasks_throughput(self, billing_rows: pd.DataFrame, **kwargs):
+        # GOAL: Cost will be assumed by the owner of the connector
+        # There will be only one active Identity but we will still split across the identities for consistency
+        # The conditions are checking for the specific connector in an environment and trying to find its owner.
+        # If No Connector Details are found, the cost is attributed as Shared Cost for the Connector ID.
+        _, owners_by_env_name = self.__get_connector_owners()
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[
+                owners_by_env_name.get((x, y), EMPTY_FROZENSET)
+                for x, y in zip(
+                    billing_rows.index.get_level_values(BILLING_API_COLUMNS.env_id),
+                    billing_rows[BILLING_API_COLUMNS.cluster_name],
                 )
-                print("=" * 80)
+            ],
+            fallback_principals=billing_rows.index.get_level_values(BILLING_API_COLUMNS.cluster_id),
+            is_shared=False,
+        )
+
+    @logged_method
+    def __compute_cluster_linking(self, billing_rows: pd.DataFrame, **kwargs):
+        # GOAL: Cost will be assumed by the Logical Cluster ID listed in the Billing API
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[EMPTY_FROZENSET] * len(billing_rows),
+            fallback_principals=billing_rows.index.get_level_values(BILLING_API_COLUMNS.cluster_id),
+        )
+
+    @logged_method
+    def __compute_governance_schema_registry(self, billing_rows: pd.DataFrame, **kwargs):
+        # GOAL: Cost will be equally spread across all the Kafka Clusters existing in this CCloud Environment
+        # If No Kafka Clusters are present within the environment, the cost is attributed as Shared Cost to the env.
+        clusters_by_env = self.__get_kafka_clusters_by_env()
+        env_ids = billing_rows.index.get_level_values(BILLING_API_COLUMNS.env_id)
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[clusters_by_env.get(x, EMPTY_FROZENSET) for x in env_ids],
+            fallback_principals=env_ids,
+            is_shared=False,
+        )
+
+    @logged_method
+    def __compute_ksql_num_csus(self, billing_rows: pd.DataFrame, **kwargs):
+        # GOAL: Cost will be assumed by the ksql Service Account/User being used by the ksqldb cluster
+        # There will be only one active Identity but we will still split across the identities for consistency
+        # The conditions are checking for the specific ksqldb cluster in an environment and trying to find its owner.
+        # If No KSQL Cluster Details are found, the cost is attributed as Shared Cost for the ksqlDB cluster ID.
+        ksql_owners_by_cid = self.__get_ksql_owners()
+        cluster_ids = billing_rows.index.get_level_values(BILLING_API_COLUMNS.cluster_id)
+        self.__add_cost_split_across_identities(
+            billing_rows=billing_rows,
+            row_identities=[ksql_owners_by_cid.get(x, EMPTY_FROZENSET) for x in cluster_ids],
+            fallback_principals=cluster_ids,
+            is_shared=False,
+        )
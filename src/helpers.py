@@ -31,10 +31,10 @@ def logged_method(func):
     @wraps(func)
     def add_entry_exit_logs(*args, **kwargs):
         if METHOD_BREADCRUMBS:
-            LOGGER.info(f"Begin method execution:\t\t{str(func.__name__)}")
+            LOGGER.info("Begin method execution:\t\t%s", func.__name__)
         ret = func(*args, **kwargs)
         if METHOD_BREADCRUMBS:
-            LOGGER.info(f"End method execution:\t\t{str(func.__name__)}")
+            LOGGER.info("End method execution:\t\t%s", func.__name__)
         return ret
 
     return add_entry_exit_logs
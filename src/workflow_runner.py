@@ -22,6 +22,7 @@ class AppProps:
     days_in_memory: int = field(default=30)
     relative_output_dir: str = field(default="output")
     loglevel: str = field(default="INFO")
+    exact_decimal: bool = field(default=False)
 
 @logged_method
 def get_app_props(in_config: Dict):
@@ -60,6 +61,7 @@ def get_app_props(in_config: Dict):
             days_in_memory=config.get("days_in_memory", 7),
             relative_output_dir=config.get("output_dir_name", "output"),
             loglevel=loglevel,
+            exact_decimal=bool(config.get("exact_decimal", False) is True),
         )
 
 
@@ -134,6 +136,7 @@ def execute_workflow(arg_flags: Namespace):
         ccloud_orgs = CCloudOrgList(
             in_orgs=core_config["config"]["org_details"],
             in_days_in_memory=APP_PROPS.days_in_memory,
+            in_exact_decimal=APP_PROPS.exact_decimal,
         )
 
         LOGGER.info("Initialization Complete.")